@@ -4,24 +4,124 @@ src/app/crud.py
 Query helpers for Weather and WeatherStats.
 
 Functions return:
-    (total, rows, total_pages, offset)
+    (total, rows, total_pages, offset, next_cursor)
 
 - total: total rows matching filters
-- rows: list of ORM objects for the current page
+- rows: list of result rows for the current page (values rounded to 2 decimals)
 - total_pages: number of pages given page_size
-- offset: offset used for pagination
+- offset: offset used for pagination (None on the cursor path)
+- next_cursor: opaque keyset cursor for the following page (None on the last page)
+
+Pagination:
+- page/offset is kept for backwards compatibility
+- cursor (keyset) seeks directly on the (station_id, date|year) unique index,
+  so deep pages cost the same as the first one
+
+Counting:
+- COUNT(*) results are cached per (table, station_id, date|year) filter for
+  COUNT_CACHE_TTL seconds, so paging through one filter counts only once
+- on the last page of the page path the total is offset + rows, no COUNT(*)
 """
 
 from __future__ import annotations  # forward refs
 
+import base64  # opaque cursor encoding
+import json  # cursor payload
+import os  # cache configuration
 from datetime import date as DateType  # date type for filters
 from math import ceil  # compute total pages
-from typing import List, Optional, Tuple  # typing
+from time import monotonic  # cache timestamps
+from typing import Any, Dict, Iterator, List, Optional, Tuple  # typing
 
+from sqlalchemy import Float, Numeric, Row, cast, func, tuple_  # SQL expressions
 from sqlalchemy.orm import Session  # DB session
 
 from .models import Weather, WeatherStats  # ORM models
 
+COUNT_CACHE_TTL = float(os.getenv("COUNT_CACHE_TTL", "60"))  # seconds; 0 disables
+COUNT_CACHE_MAX = 1024  # cap on distinct filters kept in memory
+
+_count_cache: Dict[Tuple[Any, ...], Tuple[int, float]] = {}  # key -> (total, timestamp)
+
+
+def _round_2(column):
+    """Round a float column to 2 decimal places in SQL (returned as float, not Decimal)."""
+    return cast(func.round(cast(column, Numeric), 2), Float)
+
+
+def _cached_count(key: Tuple[Any, ...], q) -> int:
+    """Return q.count(), reusing a recent result for the same filter key."""
+    now = monotonic()
+    hit = _count_cache.get(key)
+    if hit is not None and now - hit[1] < COUNT_CACHE_TTL:
+        return hit[0]
+
+    total = q.count()
+    _store_count(key, total, now)
+    return total
+
+
+def _store_count(key: Tuple[Any, ...], total: int, now: float) -> None:
+    """Remember a total for key (bounded)."""
+    if len(_count_cache) >= COUNT_CACHE_MAX:  # keep the cache bounded
+        _count_cache.clear()
+    _count_cache[key] = (total, now)
+
+
+def _page_total(key: Tuple[Any, ...], q, offset: Optional[int], rows: List[Row], has_next: bool) -> int:
+    """
+    Total rows matching the filters.
+
+    On the last page of the page path the total is offset + len(rows) and no
+    COUNT(*) is needed (an empty page past the end still has to count).
+    """
+    if offset is not None and not has_next and (rows or not offset):
+        total = offset + len(rows)
+        _store_count(key, total, monotonic())
+        return total
+    return _cached_count(key, q)
+
+
+def encode_cursor(station_id: str, key: Any) -> str:
+    """Encode the sort key of the last returned row as an opaque cursor."""
+    raw = json.dumps([station_id, key], default=str)  # dates -> ISO strings
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, Any]:
+    """
+    Decode a cursor produced by encode_cursor.
+
+    Raises ValueError if the cursor is malformed.
+    """
+    try:
+        station_id, key = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (ValueError, TypeError) as exc:  # bad base64 / json / shape
+        raise ValueError("Invalid cursor") from exc
+
+    if not isinstance(station_id, str):
+        raise ValueError("Invalid cursor")
+    return station_id, key
+
+
+def _weather_query(db: Session, station_id: Optional[str], date: Optional[DateType]):
+    """Build the filtered daily weather query (API columns only, unordered)."""
+    q = db.query(  # select only the columns the API returns
+        Weather.station_id,
+        Weather.date,
+        _round_2(Weather.max_temp_c).label("max_temp_c"),
+        _round_2(Weather.min_temp_c).label("min_temp_c"),
+        _round_2(Weather.precip_cm).label("precip_cm"),
+    )
+
+    if station_id:  # apply station filter if provided
+        q = q.filter(Weather.station_id == station_id)
+
+    if date:  # apply date filter if provided
+        q = q.filter(Weather.date == date)
+
+    return q
+
 
 def get_weather(
     db: Session,  # database session
@@ -29,26 +129,60 @@ def get_weather(
     page_size: int,  # rows per page
     station_id: Optional[str] = None,  # optional station filter
     date: Optional[DateType] = None,  # optional date filter
-) -> Tuple[int, List[Weather], int, int]:
+    cursor: Optional[str] = None,  # optional keyset cursor (overrides page)
+) -> Tuple[int, List[Row], int, Optional[int], Optional[str]]:
     """
     Fetch paginated daily weather rows.
     """
-    q = db.query(Weather)  # start query on Weather table
+    q = _weather_query(db, station_id, date)  # filtered column query
 
-    if station_id:  # apply station filter if provided
-        q = q.filter(Weather.station_id == station_id)
+    base_q = q  # filtered query, reused for COUNT(*)
 
-    if date:  # apply date filter if provided
-        q = q.filter(Weather.date == date)
+    if cursor:  # keyset path: seek past the last row of the previous page
+        cur_station, cur_date = decode_cursor(cursor)
+        try:
+            cur_date = DateType.fromisoformat(cur_date)
+        except (TypeError, ValueError) as exc:
+            raise ValueError("Invalid cursor") from exc
+        q = q.filter(tuple_(Weather.station_id, Weather.date) > tuple_(cur_station, cur_date))
+        offset = None
+    else:
+        offset = (page - 1) * page_size  # compute offset for pagination
 
     q = q.order_by(Weather.station_id.asc(), Weather.date.asc())  # stable ordering
 
-    total = q.count()  # count total rows matching filters
+    if offset:  # page path: skip earlier pages
+        q = q.offset(offset)
+
+    rows = q.limit(page_size + 1).all()  # fetch paginated rows (+1 to detect a next page)
+    has_next = len(rows) > page_size
+    rows = rows[:page_size]
+
+    total = _page_total(("weather", station_id, date), base_q, offset, rows, has_next)  # total rows matching filters
     total_pages = ceil(total / page_size) if page_size else 0  # compute total pages
-    offset = (page - 1) * page_size  # compute offset for pagination
 
-    rows = q.offset(offset).limit(page_size).all()  # fetch paginated rows
-    return total, rows, total_pages, offset  # return pagination tuple
+    next_cursor = None
+    if has_next:  # cursor for the following page
+        next_cursor = encode_cursor(rows[-1].station_id, rows[-1].date)
+
+    return total, rows, total_pages, offset, next_cursor  # return pagination tuple
+
+
+def iter_weather(
+    db: Session,  # database session
+    station_id: Optional[str] = None,  # optional station filter
+    date: Optional[DateType] = None,  # optional date filter
+    chunk: int = 1000,  # rows fetched per round-trip
+) -> Iterator[Row]:
+    """
+    Stream all matching daily weather rows through a server-side cursor.
+
+    Only `chunk` rows are held in memory at a time, so this is safe for
+    exports of any size.
+    """
+    q = _weather_query(db, station_id, date)  # filtered column query
+    q = q.order_by(Weather.station_id.asc(), Weather.date.asc())  # stable ordering
+    yield from q.yield_per(chunk)  # yield_per implies stream_results
 
 
 def get_weather_stats(
@@ -57,11 +191,18 @@ def get_weather_stats(
     page_size: int,  # rows per page
     station_id: Optional[str] = None,  # optional station filter
     year: Optional[int] = None,  # optional year filter
-) -> Tuple[int, List[WeatherStats], int, int]:
+    cursor: Optional[str] = None,  # optional keyset cursor (overrides page)
+) -> Tuple[int, List[Row], int, Optional[int], Optional[str]]:
     """
     Fetch paginated yearly weather stats rows.
     """
-    q = db.query(WeatherStats)  # start query on WeatherStats table
+    q = db.query(  # select only the columns the API returns
+        WeatherStats.station_id,
+        WeatherStats.year,
+        _round_2(WeatherStats.avg_max_temp_c).label("avg_max_temp_c"),
+        _round_2(WeatherStats.avg_min_temp_c).label("avg_min_temp_c"),
+        _round_2(WeatherStats.total_precip_cm).label("total_precip_cm"),
+    )
 
     if station_id:  # apply station filter if provided
         q = q.filter(WeatherStats.station_id == station_id)
@@ -69,11 +210,31 @@ def get_weather_stats(
     if year is not None:  # apply year filter if provided (0 is valid, so check None)
         q = q.filter(WeatherStats.year == year)
 
+    base_q = q  # filtered query, reused for COUNT(*)
+
+    if cursor:  # keyset path: seek past the last row of the previous page
+        cur_station, cur_year = decode_cursor(cursor)
+        if not isinstance(cur_year, int):
+            raise ValueError("Invalid cursor")
+        q = q.filter(tuple_(WeatherStats.station_id, WeatherStats.year) > tuple_(cur_station, cur_year))
+        offset = None
+    else:
+        offset = (page - 1) * page_size  # compute offset for pagination
+
     q = q.order_by(WeatherStats.station_id.asc(), WeatherStats.year.asc())  # stable ordering
 
-    total = q.count()  # count total rows matching filters
+    if offset:  # page path: skip earlier pages
+        q = q.offset(offset)
+
+    rows = q.limit(page_size + 1).all()  # fetch paginated rows (+1 to detect a next page)
+    has_next = len(rows) > page_size
+    rows = rows[:page_size]
+
+    total = _page_total(("weather_stats", station_id, year), base_q, offset, rows, has_next)  # total rows matching filters
     total_pages = ceil(total / page_size) if page_size else 0  # compute total pages
-    offset = (page - 1) * page_size  # compute offset for pagination
 
-    rows = q.offset(offset).limit(page_size).all()  # fetch paginated rows
-    return total, rows, total_pages, offset  # return pagination tuple
+    next_cursor = None
+    if has_next:  # cursor for the following page
+        next_cursor = encode_cursor(rows[-1].station_id, rows[-1].year)
+
+    return total, rows, total_pages, offset, next_cursor  # return pagination tuple
@@ -6,7 +6,8 @@ FastAPI entry point for the Weather API.
 Features:
 - Startup ingestion with idempotent skip logic
 - Clean, human-readable API responses
-- Values rounded to 2 decimal places
+- Values rounded to 2 decimal places (in SQL)
+- Responses serialized with orjson
 - No internal DB fields exposed (e.g., id)
 - Stable single-process startup (Windows-safe)
 """
@@ -17,14 +18,16 @@ import os
 import logging
 from contextlib import asynccontextmanager
 from datetime import date as DateType
-from decimal import Decimal
-from typing import Any, Dict, Generator, Optional
+from typing import Dict, Generator, Optional
 
-from fastapi import Depends, FastAPI, Query
+import anyio.to_thread
+import orjson
+from fastapi import Depends, FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
 
-from src.app.db import SessionLocal
+from src.app.db import DB_MAX_OVERFLOW, DB_POOL_SIZE, SessionLocal
 from src.app import crud
 from src.app.ingest_weather import run_startup_ingestion
 
@@ -51,24 +54,17 @@ def get_db() -> Generator[Session, None, None]:
         db.close()
 
 
-# -------------------------------------------------
-# Helper: round numeric values safely
-# -------------------------------------------------
-def round_2(value: Any) -> Any:
-    """Round floats / Decimals to 2 decimal places."""
-    if isinstance(value, Decimal):
-        return round(float(value), 2)
-    if isinstance(value, float):
-        return round(value, 2)
-    return value
-
-
 # -------------------------------------------------
 # Application lifespan (startup / shutdown)
 # -------------------------------------------------
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Run ingestion once at startup (skip if already ingested)."""
+    # Sync handlers run in AnyIO's threadpool (40 threads by default); match it
+    # to the DB pool so requests wait on neither threads nor connections.
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    limiter.total_tokens = int(os.getenv("THREADPOOL_SIZE", DB_POOL_SIZE + DB_MAX_OVERFLOW))
+
     try:
         logger.info("[startup] Running ingestion check...")
         run_startup_ingestion()
@@ -89,6 +85,7 @@ app = FastAPI(
     title=os.getenv("APP_TITLE", "Weather API"),
     version=os.getenv("APP_VERSION", "0.1.0"),
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,  # C-level JSON (native date/float encoding)
 )
 
 
@@ -133,37 +130,73 @@ def api_weather(
     page_size: int = Query(5, ge=1, le=500),
     station_id: Optional[str] = Query(None),
     date: Optional[DateType] = Query(None),
+    cursor: Optional[str] = Query(None, description="Keyset cursor from metadata.next_cursor; overrides page"),
     db: Session = Depends(get_db),
 ):
-    total, rows, total_pages, offset = crud.get_weather(
-        db=db,
-        page=page,
-        page_size=page_size,
-        station_id=station_id,
-        date=date,
-    )
-
-    data = []
-    for r in rows:
-        data.append({
-            "station_id": r.station_id,
-            "date": r.date.isoformat(),
+    try:
+        total, rows, total_pages, offset, next_cursor = crud.get_weather(
+            db=db,
+            page=page,
+            page_size=page_size,
+            station_id=station_id,
+            date=date,
+            cursor=cursor,
+        )
+    except ValueError as exc:  # malformed cursor
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+    data = [
+        {
+            "station_id": stn,
+            "date": obs_date,
             "temperature_celsius": {
-                "max": round_2(r.max_temp_c),
-                "min": round_2(r.min_temp_c),
+                "max": max_c,
+                "min": min_c,
             },
-            "precipitation_cm": round_2(r.precip_cm),
-        })
+            "precipitation_cm": precip_cm,
+        }
+        for stn, obs_date, max_c, min_c, precip_cm in rows
+    ]
 
-    return {
+    # return the response directly: skips FastAPI's per-value jsonable_encoder pass
+    return ORJSONResponse({
         "metadata": {
             "total_records": total,
-            "page": page,
+            "page": None if cursor else page,
             "page_size": page_size,
             "total_pages": total_pages,
+            "has_next": next_cursor is not None,
+            "next_cursor": next_cursor,
         },
         "data": data,
-    }
+    })
+
+
+# -------------------------------------------------
+# Daily weather export (NDJSON stream)
+# -------------------------------------------------
+@app.get("/api/weather/export", tags=["weather"])
+def api_weather_export(
+    station_id: Optional[str] = Query(None),
+    date: Optional[DateType] = Query(None),
+    db: Session = Depends(get_db),
+):
+    rows = crud.iter_weather(db=db, station_id=station_id, date=date)
+
+    lines = (
+        orjson.dumps({
+            "station_id": stn,
+            "date": obs_date,
+            "temperature_celsius": {
+                "max": max_c,
+                "min": min_c,
+            },
+            "precipitation_cm": precip_cm,
+        }) + b"\n"
+        for stn, obs_date, max_c, min_c, precip_cm in rows
+    )
+
+    return StreamingResponse(lines, media_type="application/x-ndjson")
 
 
 # -------------------------------------------------
@@ -175,39 +208,48 @@ def api_weather_stats(
     page_size: int = Query(3, ge=1, le=500),
     station_id: Optional[str] = Query(None),
     year: Optional[int] = Query(None),
+    cursor: Optional[str] = Query(None, description="Keyset cursor from metadata.next_cursor; overrides page"),
     db: Session = Depends(get_db),
 ):
-    total, rows, total_pages, offset = crud.get_weather_stats(
-        db=db,
-        page=page,
-        page_size=page_size,
-        station_id=station_id,
-        year=year,
-    )
-
-    data = []
-    for r in rows:
-        data.append({
-            "station_id": r.station_id,
-            "year": r.year,
+    try:
+        total, rows, total_pages, offset, next_cursor = crud.get_weather_stats(
+            db=db,
+            page=page,
+            page_size=page_size,
+            station_id=station_id,
+            year=year,
+            cursor=cursor,
+        )
+    except ValueError as exc:  # malformed cursor
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+    data = [
+        {
+            "station_id": stn,
+            "year": yr,
             "temperature_celsius": {
-                "average_max": round_2(r.avg_max_temp_c),
-                "average_min": round_2(r.avg_min_temp_c),
+                "average_max": avg_max_c,
+                "average_min": avg_min_c,
             },
             "precipitation_cm": {
-                "total": round_2(r.total_precip_cm),
+                "total": total_precip_cm,
             },
-        })
+        }
+        for stn, yr, avg_max_c, avg_min_c, total_precip_cm in rows
+    ]
 
-    return {
+    # return the response directly: skips FastAPI's per-value jsonable_encoder pass
+    return ORJSONResponse({
         "metadata": {
             "total_records": total,
-            "page": page,
+            "page": None if cursor else page,
             "page_size": page_size,
             "total_pages": total_pages,
+            "has_next": next_cursor is not None,
+            "next_cursor": next_cursor,
         },
         "data": data,
-    }
+    })
 
 
 # -------------------------------------------------
@@ -1,33 +1,41 @@
 # src/app/models.py
 from __future__ import annotations
 
-from sqlalchemy import Column, Integer, String, Float, Date, UniqueConstraint, Index
+from sqlalchemy import Column, Integer, String, Float, REAL, Date, UniqueConstraint, Index
 from .db import Base
 
 
 class Weather(Base):
     __tablename__ = "weather"
 
-    id = Column(Integer, primary_key=True, index=True)
-    station_id = Column(String, nullable=False, index=True)
+    id = Column(Integer, primary_key=True)
+    station_id = Column(String, nullable=False)  # leading column of the unique index
     date = Column(Date, nullable=False, index=True)
 
     # store in "nice" units to match API expectations
-    max_temp_c = Column(Float, nullable=True)
-    min_temp_c = Column(Float, nullable=True)
-    precip_cm = Column(Float, nullable=True)
+    # REAL (4 bytes) is ample for 0.1 C / 0.01 cm readings and halves scan size
+    max_temp_c = Column(REAL, nullable=True)
+    min_temp_c = Column(REAL, nullable=True)
+    precip_cm = Column(REAL, nullable=True)
 
     __table_args__ = (
-        UniqueConstraint("station_id", "date", name="uq_weather_station_date"),
-        Index("ix_weather_station_date", "station_id", "date"),
+        # one index for both uniqueness (ON CONFLICT target) and covering
+        # reads: paginated queries are served by index-only scans
+        Index(
+            "uq_weather_station_date",
+            "station_id",
+            "date",
+            unique=True,
+            postgresql_include=["max_temp_c", "min_temp_c", "precip_cm"],
+        ),
     )
 
 
 class WeatherStats(Base):
     __tablename__ = "weather_stats"
 
-    id = Column(Integer, primary_key=True, index=True)
-    station_id = Column(String, nullable=False, index=True)
+    id = Column(Integer, primary_key=True)
+    station_id = Column(String, nullable=False)  # leading column of the unique constraint
     year = Column(Integer, nullable=False, index=True)
 
     avg_max_temp_c = Column(Float, nullable=True)
@@ -36,5 +44,4 @@ class WeatherStats(Base):
 
     __table_args__ = (
         UniqueConstraint("station_id", "year", name="uq_stats_station_year"),
-        Index("ix_stats_station_year", "station_id", "year"),
     )
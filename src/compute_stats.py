@@ -15,8 +15,15 @@ from datetime import datetime
 # - func: avg/sum
 # - extract: extract year from date
 # - Integer: correct SQLAlchemy type (NOT Python int)
+# - select: aggregation SELECT feeding the INSERT
+# - cast/Float: aggregate REAL columns in double precision
 # ------------------------------------------------------------
-from sqlalchemy import func, extract, Integer
+from sqlalchemy import func, extract, Integer, select, cast, Float
+
+# ------------------------------------------------------------
+# PostgreSQL INSERT with ON CONFLICT support
+# ------------------------------------------------------------
+from sqlalchemy.dialects.postgresql import insert
 
 # ------------------------------------------------------------
 # SQLAlchemy session manager
@@ -49,48 +56,51 @@ def main() -> None:
     # Record start time for log output
     start = datetime.now()
 
-    # Track how many stat rows we wrote
-    rows_written = 0
-
     # Open DB session
     with Session(engine) as db:
         # Build a reusable "year expression" for SELECT and GROUP BY
         year_expr = extract("year", Weather.date).cast(Integer)
 
         # Build an aggregation query grouped by station and year
-        query = (
-            db.query(
+        aggregate = (
+            select(
                 # Station identifier
-                Weather.station_id.label("station_id"),
+                Weather.station_id,
                 # Year derived from Weather.date
-                year_expr.label("year"),
+                year_expr,
                 # Average max temp across that year
-                func.avg(Weather.max_temp_c).label("avg_max_temp_c"),
+                func.avg(cast(Weather.max_temp_c, Float)),
                 # Average min temp across that year
-                func.avg(Weather.min_temp_c).label("avg_min_temp_c"),
-                # Total precipitation across that year
-                func.sum(Weather.precip_cm).label("total_precip_cm"),
+                func.avg(cast(Weather.min_temp_c, Float)),
+                # Total precipitation across that year (SUM(real) would stay REAL)
+                func.sum(cast(Weather.precip_cm, Float)),
             )
             # Group results by station_id and year
             .group_by(Weather.station_id, year_expr)
         )
 
-        # Execute query (returns one row per station-year)
-        results = query.all()
-
-        # Upsert each aggregated row into WeatherStats
-        for r in results:
-            # db.merge() will INSERT if not present, UPDATE if present
-            db.merge(
-                WeatherStats(
-                    station_id=r.station_id,
-                    year=int(r.year),
-                    avg_max_temp_c=r.avg_max_temp_c,
-                    avg_min_temp_c=r.avg_min_temp_c,
-                    total_precip_cm=r.total_precip_cm,
-                )
-            )
-            rows_written += 1
+        # INSERT ... SELECT: Postgres aggregates and writes in one statement,
+        # no rows are pulled into Python
+        stmt = insert(WeatherStats).from_select(
+            ["station_id", "year", "avg_max_temp_c", "avg_min_temp_c", "total_precip_cm"],
+            aggregate,
+        )
+
+        # Upsert on (station_id, year): INSERT if not present, UPDATE if present
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["station_id", "year"],
+            set_={
+                "avg_max_temp_c": stmt.excluded.avg_max_temp_c,
+                "avg_min_temp_c": stmt.excluded.avg_min_temp_c,
+                "total_precip_cm": stmt.excluded.total_precip_cm,
+            },
+        )
+
+        # Execute once (one row written per station-year)
+        result = db.execute(stmt)
+
+        # Track how many stat rows we wrote
+        rows_written = result.rowcount
 
         # Commit all changes
         db.commit()
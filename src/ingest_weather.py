@@ -15,41 +15,166 @@ We store:
 
 Behavior:
 - Skips ingestion if table already has rows unless FORCE_INGEST=1
-- Uses bulk UPSERT on (station_id, date)
-- Prints progress every COMMIT_EVERY rows
+- Parses files in INGEST_WORKERS processes, each producing a COPY buffer;
+  at most PARSE_AHEAD parsed files wait in memory for the COPY stream
+- COPYs rows into a temp staging table, then UPSERTs stage -> weather on (station_id, date)
+- Merges the stage and prints progress every COMMIT_EVERY rows; commits once at the end
+- VACUUM (ANALYZE) weather once loaded
 """
 
 from __future__ import annotations
 
+import io
 import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from pathlib import Path
-from typing import Optional, List, Tuple
+from typing import Iterator, List, Optional, Tuple
 
-import psycopg2
-from psycopg2.extras import execute_values
-from sqlalchemy import create_engine, text
+try:
+    import psycopg2
+except ImportError:  # PyPy: psycopg2cffi provides the same API
+    from psycopg2cffi import compat
+
+    compat.register()
+    import psycopg2
 
 
 WX_DIR = Path(os.getenv("WX_DIR", "wx_data"))
-COMMIT_EVERY = int(os.getenv("COMMIT_EVERY", "20000"))
+COMMIT_EVERY = int(os.getenv("COMMIT_EVERY", "50000"))
 FORCE_INGEST = os.getenv("FORCE_INGEST", "0").strip().lower() in {"1", "true", "yes", "y"}
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(os.cpu_count() or 1)))
+# parsed-but-not-yet-COPYed files held in memory at once
+PARSE_AHEAD = int(os.getenv("PARSE_AHEAD", str(max(4, 2 * INGEST_WORKERS))))
+COPY_CHUNK = 1 << 20  # bytes handed to libpq per COPY data message
+
+# Precomputed COPY text for the integer readings: tenths of C -> "d.d" C,
+# tenths of mm -> "d.dd" cm. Covers every plausible observation.
+TENTHS = {i: b"%.1f" % (i / 10) for i in range(-2000, 2001)}
+HUNDREDTHS = {i: b"%.2f" % (i / 100) for i in range(-2000, 20001)}
+
+# Session-scoped staging table with weather's column types. TEMP tables are not
+# WAL-logged (same as UNLOGGED). Not ON COMMIT DROP: it is reused (and
+# truncated) across the periodic merges.
+STAGE_SQL = """
+    CREATE TEMP TABLE weather_stage AS
+    SELECT station_id, date, max_temp_c, min_temp_c, precip_cm
+    FROM weather WITH NO DATA
+"""
+
+# Text-format COPY: tab-separated, \N for NULL
+COPY_SQL = "COPY weather_stage (station_id, date, max_temp_c, min_temp_c, precip_cm) FROM STDIN"
+
+# A key repeated within one merge would make ON CONFLICT DO UPDATE fail with
+# "cannot affect row a second time"; keep only the last copy of each key
+# (the stage is append-only between TRUNCATEs, so highest ctid = last COPYed)
+MERGE_SQL = """
+    INSERT INTO weather (station_id, date, max_temp_c, min_temp_c, precip_cm)
+    SELECT DISTINCT ON (station_id, date)
+        station_id, date, max_temp_c, min_temp_c, precip_cm
+    FROM weather_stage
+    ORDER BY station_id, date, ctid DESC
+    ON CONFLICT (station_id, date) DO UPDATE SET
+        max_temp_c = EXCLUDED.max_temp_c,
+        min_temp_c = EXCLUDED.min_temp_c,
+        precip_cm = EXCLUDED.precip_cm
+"""
 
 
-def _parse_int(x: str) -> Optional[int]:
-    x = x.strip()
-    if x == "" or x == "-9999":
-        return None
+def _parse_int(x: bytes) -> Optional[int]:
+    # int() already skips the fixed-width padding, so no strip(); the try is
+    # free unless a token is actually malformed (-> None, same as missing)
     try:
-        return int(x)
+        v = int(x)
     except ValueError:
         return None
+    return None if v == -9999 else v
 
 
-def _weather_count(database_url: str) -> int:
-    eng = create_engine(database_url, pool_pre_ping=True)
-    with eng.connect() as c:
-        return int(c.execute(text("select count(*) from weather")).scalar() or 0)
+def _file_to_copybuf(path: str) -> Tuple[bytes, int, int]:
+    # Parse one station file into COPY text (runs in a worker process).
+    # Works on bytes end to end: no decode, and rows go straight into one
+    # byte buffer. Returns (buffer, lines, skipped_bad_lines).
+    station_id = os.path.splitext(os.path.basename(path))[0].encode("utf-8")  # encoded once per file
+    out = io.BytesIO()
+    lines = 0
+    skipped_bad_lines = 0
+    last_ym = None  # YYYYMM of the previous line (files are chronological)
+    row_prefix = b""  # b"<station_id>\tYYYY-MM-" for last_ym
+
+    # station files are a few MB: read once and split in one call rather
+    # than iterating the file object line by line
+    with open(path, "rb") as f:
+        data = f.read()
+    rows = data.split(b"\n")
+    if rows and not rows[-1]:
+        rows.pop()  # empty piece after the final newline
+
+    # hot-loop names bound to locals (LOAD_FAST instead of global/attr lookups)
+    write = out.write
+    parse_int = _parse_int
+    tenths = TENTHS.get
+    hundredths = HUNDREDTHS.get
+
+    for line in rows:
+        lines += 1
+        parts = line.rstrip(b"\r\n").split(b"\t")
+        if len(parts) < 4:
+            skipped_bad_lines += 1
+            continue
+
+        # dates are unpadded YYYYMMDD, so no strip(); isdigit() stays since a
+        # bad date would reach COPY and abort the whole load
+        datestr = parts[0]
+        if len(datestr) != 8 or not datestr.isdigit():
+            skipped_bad_lines += 1
+            continue
+
+        # parse ints
+        tmax_i = parse_int(parts[1])
+        tmin_i = parse_int(parts[2])
+        prcp_i = parse_int(parts[3])
+
+        # convert units straight to COPY text (\N = NULL); table lookups,
+        # formatting only for values outside the tables' range
+        max_c = b"\\N" if tmax_i is None else tenths(tmax_i) or b"%.1f" % (tmax_i / 10)
+        min_c = b"\\N" if tmin_i is None else tenths(tmin_i) or b"%.1f" % (tmin_i / 10)
+        precip_cm = b"\\N" if prcp_i is None else hundredths(prcp_i) or b"%.2f" % (prcp_i / 100)  # tenths mm -> cm
+
+        # store date as YYYY-MM-DD string (Postgres will cast); the row
+        # starts "<station_id>\tYYYY-MM-", rebuilt only when the month changes
+        ym = datestr[:6]
+        if ym != last_ym:
+            last_ym = ym
+            row_prefix = station_id + b"\t" + ym[:4] + b"-" + ym[4:] + b"-"
+
+        write(b"%s%s\t%s\t%s\t%s\n" % (row_prefix, datestr[6:8], max_c, min_c, precip_cm))
+
+    return out.getvalue(), lines, skipped_bad_lines
+
+
+def _iter_parsed(pool: ProcessPoolExecutor, files: List[str]) -> Iterator[Tuple[bytes, int, int]]:
+    # Yield parsed files in order while the pool keeps working PARSE_AHEAD
+    # files ahead of the COPY loop. Unlike pool.map (which submits every file
+    # up front), finished buffers can't pile up if COPY is the slower stage.
+    it = iter(files)
+    inflight = deque(pool.submit(_file_to_copybuf, path) for _, path in zip(range(PARSE_AHEAD), it))
+    while inflight:
+        result = inflight.popleft().result()
+        path = next(it, None)
+        if path is not None:
+            inflight.append(pool.submit(_file_to_copybuf, path))
+        yield result
+
+
+def _merge_stage(cur) -> int:
+    # upsert the staged rows into weather, then empty the stage;
+    # returns the number of (deduplicated) rows upserted
+    cur.execute(MERGE_SQL)
+    merged = cur.rowcount
+    cur.execute("TRUNCATE weather_stage")
+    return merged
 
 
 def main() -> None:
@@ -62,87 +187,71 @@ def main() -> None:
             "DATABASE_URL is not set. Example: postgresql+psycopg2://postgres:password@db:5432/weather"
         )
 
-    # Pre-check: skip if table already populated (unless forced)
-    existing = _weather_count(database_url)
-    if existing > 0 and not FORCE_INGEST:
-        print(
-            f"[ingest] skipping (weather already has {existing} rows). "
-            f"Set FORCE_INGEST=1 to re-ingest.",
-            flush=True,
-        )
-        return
-
-    if not WX_DIR.exists() or not WX_DIR.is_dir():
-        raise RuntimeError(f"[ingest] wx_data directory not found: {WX_DIR.resolve()}")
-
-    files = sorted(WX_DIR.glob("*.txt"))
-    print(f"[ingest] wx_dir={WX_DIR.resolve()} files={len(files)} commit_every={COMMIT_EVERY} force={FORCE_INGEST}", flush=True)
-
     # psycopg2 expects "postgresql://" not "postgresql+psycopg2://"
     pg_dsn = database_url.replace("postgresql+psycopg2://", "postgresql://", 1)
+    # one connection for the whole run: pre-check, load, and VACUUM
     conn = psycopg2.connect(pg_dsn)
     conn.autocommit = False
 
-    upsert_sql = """
-        INSERT INTO weather (station_id, date, max_temp_c, min_temp_c, precip_cm)
-        VALUES %s
-        ON CONFLICT (station_id, date) DO UPDATE SET
-            max_temp_c = EXCLUDED.max_temp_c,
-            min_temp_c = EXCLUDED.min_temp_c,
-            precip_cm = EXCLUDED.precip_cm
-    """
-
     total_lines = 0
     upserts = 0
     skipped_bad_lines = 0
-    batch: List[Tuple[str, str, Optional[float], Optional[float], Optional[float]]] = []
+    pending = 0  # rows COPYed into the stage since the last merge
 
     try:
         with conn.cursor() as cur:
-            for fp in files:
-                station_id = fp.stem
-                with fp.open("r", encoding="utf-8", errors="ignore") as f:
-                    for line in f:
-                        total_lines += 1
-                        parts = line.rstrip("\n").split("\t")
-                        if len(parts) < 4:
-                            skipped_bad_lines += 1
-                            continue
-
-                        datestr = parts[0].strip()
-                        if len(datestr) != 8 or not datestr.isdigit():
-                            skipped_bad_lines += 1
-                            continue
-
-                        # parse ints
-                        tmax_i = _parse_int(parts[1])
-                        tmin_i = _parse_int(parts[2])
-                        prcp_i = _parse_int(parts[3])
-
-                        # convert units
-                        max_c = None if tmax_i is None else tmax_i / 10.0
-                        min_c = None if tmin_i is None else tmin_i / 10.0
-                        precip_cm = None if prcp_i is None else (prcp_i / 10.0) / 10.0  # tenths mm -> mm -> cm
-
-                        # store date as YYYY-MM-DD string (psycopg2 will cast)
-                        obs_date = f"{datestr[0:4]}-{datestr[4:6]}-{datestr[6:8]}"
-
-                        batch.append((station_id, obs_date, max_c, min_c, precip_cm))
-
-                        if len(batch) >= COMMIT_EVERY:
-                            execute_values(cur, upsert_sql, batch, page_size=5000)
-                            conn.commit()
-                            upserts += len(batch)
-                            print(f"[ingest] committed {upserts} upserts...", flush=True)
-                            batch.clear()
+            # Pre-check: skip if table already populated (unless forced);
+            # EXISTS stops at the first row instead of counting the whole table
+            cur.execute("select exists (select 1 from weather)")
+            if cur.fetchone()[0] and not FORCE_INGEST:
+                print(
+                    "[ingest] skipping (weather already has rows). "
+                    "Set FORCE_INGEST=1 to re-ingest.",
+                    flush=True,
+                )
+                return
+
+        if not WX_DIR.exists() or not WX_DIR.is_dir():
+            raise RuntimeError(f"[ingest] wx_data directory not found: {WX_DIR.resolve()}")
+
+        # scandir yields plain names/paths (no Path object per entry)
+        with os.scandir(WX_DIR) as it:
+            files = sorted(e.path for e in it if e.name.endswith(".txt"))
+        print(f"[ingest] wx_dir={WX_DIR.resolve()} files={len(files)} commit_every={COMMIT_EVERY} workers={INGEST_WORKERS} force={FORCE_INGEST}", flush=True)
+
+        with ProcessPoolExecutor(max_workers=INGEST_WORKERS) as pool, conn.cursor() as cur:
+            # Bulk load: don't wait for the WAL flush on commit (this session only).
+            # A crash can lose the final commit, which a re-run with FORCE_INGEST redoes.
+            cur.execute("SET synchronous_commit = off")
+            cur.execute(STAGE_SQL)
+
+            # workers parse files in parallel; this process owns the single COPY stream
+            for data, lines, bad in _iter_parsed(pool, files):
+                # one large chunk per read instead of copy_expert's 8 KiB default
+                cur.copy_expert(COPY_SQL, io.BytesIO(data), size=COPY_CHUNK)
+                total_lines += lines
+                skipped_bad_lines += bad
+                pending += lines - bad
+
+                # merge periodically to keep the stage small; commit only at the end
+                if pending >= COMMIT_EVERY:
+                    upserts += _merge_stage(cur)
+                    print(f"[ingest] merged {upserts} upserts...", flush=True)
+                    pending = 0
 
             # final flush
-            if batch:
-                execute_values(cur, upsert_sql, batch, page_size=5000)
-                conn.commit()
-                upserts += len(batch)
-                print(f"[ingest] committed {upserts} upserts...", flush=True)
-                batch.clear()
+            if pending:
+                upserts += _merge_stage(cur)
+                pending = 0
+
+            # single transaction for the whole load: one commit, one WAL flush
+            conn.commit()
+            print(f"[ingest] committed {upserts} upserts.", flush=True)
+
+            # refresh planner stats and the visibility map so the covering
+            # index can answer API reads with index-only scans
+            conn.autocommit = True
+            cur.execute("VACUUM (ANALYZE) weather")
 
     finally:
         conn.close()